@@ -0,0 +1,93 @@
+"""Callback marshrutlash narxi: handlerlar soni oshganda bitta callback qancha turadi.
+
+Ishlatish:
+    python benchmarks/bench_callbacks.py --handlers 10,50,100,500,1000
+
+Ikki usul bir xil Dispatcher.feed_update() orqali o'lchanadi:
+  - filters: har bir handler alohida F.data.startswith(...) filtri bilan (eski usul)
+  - router:  bitta callback handler + CallbackRouter (prefiks bo'yicha dict lookup)
+Callback oxirgi ro'yxatdan o'tgan handlerga tushadi (filtrlar uchun eng yomon holat).
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+import types as pytypes
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiogram import Bot, Dispatcher, F, types
+from aiogram.filters.callback_data import CallbackData
+from aiogram.fsm.context import FSMContext
+
+from callbacks import CB_VERSION, CallbackRouter
+
+
+def callback_update(update_id, data):
+    return types.Update.model_validate({
+        "update_id": update_id,
+        "callback_query": {"id": str(update_id), "chat_instance": "bench", "data": data,
+                           "from": {"id": 42, "is_bot": False, "first_name": "bench"}}})
+
+
+async def noop(*args, **kwargs):
+    pass
+
+
+def build_filters(count):
+    dp = Dispatcher()
+    for i in range(count):
+        dp.callback_query(F.data.startswith(f"h{i}_"))(noop)
+    return dp, f"h{count - 1}_123"
+
+
+def build_router(count):
+    dp = Dispatcher()
+    router = CallbackRouter()
+
+    @dp.callback_query()
+    async def dispatch(callback: types.CallbackQuery, state: FSMContext):
+        await router.dispatch(callback, state)
+
+    cb_cls = None
+    for i in range(count):
+        cb_cls = pytypes.new_class(f"H{i}", (CallbackData,), {"prefix": f"{CB_VERSION}h{i}"},
+                                   lambda ns: ns.update({"__annotations__": {"n": int}}))
+
+        async def handler(callback, callback_data):
+            pass
+        router.route(cb_cls)(handler)
+    return dp, cb_cls(n=123).pack()
+
+
+async def measure(bot, dp, data, rounds):
+    updates = [callback_update(i, data) for i in range(rounds)]
+    # Isitish
+    for update in updates[:100]:
+        await dp.feed_update(bot, update)
+    start = time.perf_counter()
+    for update in updates:
+        await dp.feed_update(bot, update)
+    return (time.perf_counter() - start) / rounds * 1e6
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--handlers", default="10,50,100,500,1000")
+    parser.add_argument("--rounds", type=int, default=2000)
+    args = parser.parse_args()
+
+    bot = Bot(token="123456:BENCH")
+    print(f"{'handlerlar':>10} {'filters mks':>12} {'router mks':>11} {'farq':>7}")
+    for count in map(int, args.handlers.split(",")):
+        dp, data = build_filters(count)
+        linear = await measure(bot, dp, data, args.rounds)
+        dp, data = build_router(count)
+        routed = await measure(bot, dp, data, args.rounds)
+        print(f"{count:>10} {linear:>12.1f} {routed:>11.1f} {linear / routed:>6.1f}x")
+    await bot.session.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,98 @@
+"""Shardli rejim benchmarki: 1 dan N gacha workerda updates/sec.
+
+Ishlatish:
+    python benchmarks/bench_shards.py --updates 20000 --max-workers 4
+
+Har bir o'lchov uchun toza SQLite baza, soxta Bot API va alohida `python main.py`
+jarayoni (WORKERS=n) ishga tushiriladi. Vaqt birinchi getUpdates javobidan oxirgi
+update ga javob kelguncha o'lchanadi.
+"""
+import argparse
+import asyncio
+import os
+import signal
+import sqlite3
+import sys
+import tempfile
+
+from fake_bot_api import FakeBotAPI, make_callback_update, make_message_update
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from callbacks import Click
+
+
+def seed_db(path, users):
+    with sqlite3.connect(path) as conn:
+        conn.execute('''CREATE TABLE IF NOT EXISTS users
+                        (id INTEGER PRIMARY KEY,
+                         balance REAL DEFAULT 0.0,
+                         status_level INTEGER DEFAULT 0,
+                         status_expire TEXT,
+                         referrer_id INTEGER,
+                         joined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
+        # Juft ID lar Silver (clicker ochiq)
+        conn.executemany("INSERT INTO users (id, balance, status_level) VALUES (?, 100.0, ?)",
+                         [(uid, 1 if uid % 2 == 0 else 0) for uid in range(1, users + 1)])
+        conn.commit()
+
+
+def make_updates(count, users):
+    updates = []
+    for i in range(1, count + 1):
+        uid = (i * 7919) % users + 1
+        kind = i % 3
+        if kind == 0 and uid % 2 == 0:
+            updates.append(make_callback_update(i, uid, Click().pack()))
+        elif kind == 1:
+            updates.append(make_message_update(i, uid, "👤 Kabinet"))
+        else:
+            updates.append(make_message_update(i, uid, "🌟 Statuslar"))
+    return updates
+
+
+async def run_once(workers, updates, users, timeout):
+    api = FakeBotAPI(updates)
+    port = await api.start()
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        seed_db(db_path, users)
+        env = dict(os.environ, BOT_TOKEN="123456:BENCH", ADMIN_ID="1", DB_NAME=db_path,
+                   WORKERS=str(workers), BOT_API_URL=f"http://127.0.0.1:{port}", PYTHONUNBUFFERED="1")
+        proc = await asyncio.create_subprocess_exec(sys.executable, os.path.join(ROOT, "main.py"), env=env,
+                                                    stdout=asyncio.subprocess.DEVNULL,
+                                                    stderr=asyncio.subprocess.DEVNULL)
+        try:
+            await asyncio.wait_for(api.done.wait(), timeout)
+        finally:
+            proc.send_signal(signal.SIGINT)
+            try:
+                await asyncio.wait_for(proc.wait(), 15)
+            except asyncio.TimeoutError:
+                proc.kill()
+                await proc.wait()
+            await api.stop()
+    return api.elapsed
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--updates", type=int, default=20000)
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--timeout", type=float, default=300)
+    args = parser.parse_args()
+
+    updates = make_updates(args.updates, args.users)
+    print(f"{'workers':>7} {'updates':>8} {'sekund':>8} {'upd/s':>9} {'tezlashish':>10}")
+    base = None
+    for workers in range(1, args.max_workers + 1):
+        elapsed = await run_once(workers, updates, args.users, args.timeout)
+        rate = len(updates) / elapsed
+        base = base or rate
+        print(f"{workers:>7} {len(updates):>8} {elapsed:>8.2f} {rate:>9.0f} {rate / base:>9.2f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,127 @@
+"""Storage backendlari benchmarki: bir xil operatsiyalar to'plami har bir backendda.
+
+Ishlatish:
+    python benchmarks/bench_storage.py --users 2000
+    DATABASE_URL=postgresql://localhost/bench python benchmarks/bench_storage.py --backends postgres
+
+PostgreSQL faqat DATABASE_URL berilganda (va asyncpg o'rnatilganda) o'lchanadi.
+Har bir o'lchovdan keyin natijalar tekshiriladi, shuning uchun skript backendlar
+bir xil ishlashini ham tasdiqlaydi.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from storage import MemoryStorage, PostgresStorage, SQLiteStorage
+
+
+async def timed(results, name, count, coro_fn):
+    start = time.perf_counter()
+    await coro_fn()
+    elapsed = time.perf_counter() - start
+    results.append((name, count, elapsed))
+
+
+async def run_suite(storage, users):
+    await storage.connect()
+    results = []
+    ids = list(range(1, users + 1))
+
+    async def add_users():
+        for uid in ids:
+            await storage.add_user(uid)
+
+    async def read_users():
+        for uid in ids:
+            assert await storage.user_exists(uid)
+            await storage.get_user(uid)
+
+    async def credit():
+        for uid in ids:
+            await storage.add_balance(uid, 10.0)
+
+    async def credit_batch():
+        await storage.add_balances([(uid, 0.5) for uid in ids])
+
+    async def transfers():
+        for uid in ids[:-1]:
+            await storage.transfer(uid, uid + 1, 1.0)
+
+    async def configs():
+        for _ in ids:
+            await storage.get_config("price_web", 50.0)
+
+    async def buy_status():
+        for uid in ids:
+            await storage.buy_status(uid, 2.0, 1, "2099-01-01 00:00:00")
+
+    async def top():
+        for _ in range(100):
+            await storage.top_users(10)
+
+    await timed(results, "add_user", users, add_users)
+    await timed(results, "user_exists+get_user", users, read_users)
+    await timed(results, "add_balance", users, credit)
+    await timed(results, "add_balances (batch)", users, credit_batch)
+    await timed(results, "transfer", users - 1, transfers)
+    await timed(results, "get_config", users, configs)
+    await timed(results, "buy_status", users, buy_status)
+    await timed(results, "top_users(10)", 100, top)
+
+    # Tekshiruv: pul yo'qolmagan va yaratilmagan bo'lishi kerak
+    total = 0.0
+    for uid in ids:
+        balance, level, _ = await storage.get_user(uid)
+        assert level == 1
+        total += balance
+    expected = users * (10.0 + 0.5 - 2.0)
+    assert abs(total - expected) < 1e-6, (total, expected)
+    top_rows = await storage.top_users(1)
+    assert top_rows[0][0] == users
+    version = await storage.get_config_version()
+    await storage.set_config("price_web", 60.0)
+    assert await storage.get_config_version() == version + 1
+    assert await storage.get_config("price_web", 50.0) == "60.0"
+
+    await storage.close()
+    return results
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--backends", default="memory,sqlite,postgres")
+    args = parser.parse_args()
+
+    for kind in args.backends.split(","):
+        with tempfile.TemporaryDirectory() as tmp:
+            if kind == "memory":
+                storage = MemoryStorage()
+            elif kind == "sqlite":
+                storage = SQLiteStorage(os.path.join(tmp, "bench.db"))
+            elif kind == "postgres":
+                if not os.getenv("DATABASE_URL"):
+                    print("\n[postgres] DATABASE_URL berilmagan, o'tkazib yuborildi")
+                    continue
+                storage = PostgresStorage(os.getenv("DATABASE_URL"))
+                await storage.connect()
+                # Toza jadvallar bilan boshlash
+                await storage.pool.execute("TRUNCATE users, config, projects RESTART IDENTITY")
+                await storage.close()
+            else:
+                raise SystemExit(f"Noma'lum backend: {kind}")
+
+            results = await run_suite(storage, args.users)
+            print(f"\n[{kind}]")
+            print(f"{'operatsiya':<24} {'soni':>7} {'sekund':>9} {'op/s':>10}")
+            for name, count, elapsed in results:
+                print(f"{name:<24} {count:>7} {elapsed:>9.3f} {count / elapsed:>10.0f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
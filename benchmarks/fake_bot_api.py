@@ -0,0 +1,85 @@
+"""Soxta Telegram Bot API (faqat benchmark uchun).
+
+Oldindan tayyorlangan update larni getUpdates orqali beradi va bot javoblarini
+(sendMessage, answerCallbackQuery, ...) sanaydi. main.py ga BOT_API_URL orqali ulanadi.
+"""
+import asyncio
+import json
+import time
+
+from aiohttp import web
+
+# Bot yuboradigan "javob" metodlari: har bir update uchun bittadan kutiladi
+REPLY_METHODS = {"sendMessage", "answerCallbackQuery", "editMessageText", "sendPhoto", "sendDocument"}
+
+
+def make_message_update(update_id, user_id, text):
+    return {"update_id": update_id,
+            "message": {"message_id": update_id, "date": 0,
+                        "chat": {"id": user_id, "type": "private"},
+                        "from": {"id": user_id, "is_bot": False, "first_name": f"u{user_id}"},
+                        "text": text}}
+
+
+def make_callback_update(update_id, user_id, data):
+    return {"update_id": update_id,
+            "callback_query": {"id": str(update_id), "chat_instance": "bench",
+                               "from": {"id": user_id, "is_bot": False, "first_name": f"u{user_id}"},
+                               "data": data}}
+
+
+class FakeBotAPI:
+    def __init__(self, updates, batch_size=100):
+        self.updates = updates
+        self.batch_size = batch_size
+        self.replies = 0
+        self.started_at = None
+        self.done = asyncio.Event()
+        self.finished_at = None
+        self.runner = None
+
+    async def handle(self, request):
+        method = request.match_info["method"]
+        form = await request.post()
+        if method == "getMe":
+            return self.ok({"id": 1, "is_bot": True, "first_name": "Bench", "username": "bench_bot"})
+        if method == "getUpdates":
+            offset = int(form.get("offset") or 0)
+            # update_id lar 1 dan boshlanadi
+            batch = self.updates[max(offset - 1, 0):max(offset - 1, 0) + self.batch_size]
+            if batch and self.started_at is None:
+                self.started_at = time.perf_counter()
+            if not batch:
+                await asyncio.sleep(0.2)
+            return self.ok(batch)
+        if method in REPLY_METHODS:
+            self.replies += 1
+            if self.replies >= len(self.updates) and not self.done.is_set():
+                self.finished_at = time.perf_counter()
+                self.done.set()
+            if method == "answerCallbackQuery":
+                return self.ok(True)
+            chat_id = int(form.get("chat_id") or 0)
+            return self.ok({"message_id": self.replies, "date": 0,
+                            "chat": {"id": chat_id, "type": "private"}, "text": "ok"})
+        return self.ok(True)
+
+    @staticmethod
+    def ok(result):
+        return web.Response(text=json.dumps({"ok": True, "result": result}), content_type="application/json")
+
+    async def start(self, port=0):
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self.handle)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", port)
+        await site.start()
+        return site._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+    @property
+    def elapsed(self):
+        return self.finished_at - self.started_at
@@ -0,0 +1,142 @@
+"""Callback tugmalari uchun ixcham, versiyali ma'lumot va O(1) router.
+
+Har bir tugma turi - aiogram CallbackData klassi (maydonlar tiplangan). Kodlash:
+    <versiya><qisqa prefiks>[:maydon1[:maydon2...]]     masalan: "1bs:2", "1pk:123456:1050"
+Router prefiks bo'yicha bitta dict lookup qiladi va handlerga tayyor (parse qilingan)
+obyektni beradi - handlerlar soni oshgani bilan marshrutlash qimmatlashmaydi.
+
+Eski formatdagi (versiyasiz, "view_proj_5", "p_ok:1:10.0" kabi) tugmalar chatlarda qolgan
+bo'lishi mumkin, ular parse_legacy() orqali yangi obyektlarga o'giriladi.
+"""
+import inspect
+import logging
+
+from aiogram.filters.callback_data import CallbackData
+
+# Format o'zgarsa versiya oshiriladi (eski versiyadagi tugmalarni ajratib olish uchun)
+CB_VERSION = "1"
+
+
+# --- CALLBACK TURLARI ---
+class TransferStart(CallbackData, prefix=CB_VERSION + "ts"):
+    pass
+
+class Click(CallbackData, prefix=CB_VERSION + "ck"):
+    pass
+
+class StatusShop(CallbackData, prefix=CB_VERSION + "ss"):
+    pass
+
+class BuyStatus(CallbackData, prefix=CB_VERSION + "bs"):
+    level: int
+
+class ViewProject(CallbackData, prefix=CB_VERSION + "vp"):
+    pid: int
+
+class BuyProject(CallbackData, prefix=CB_VERSION + "bp"):
+    pid: int
+
+class Service(CallbackData, prefix=CB_VERSION + "sv"):
+    kind: str
+
+class AdmBroadcast(CallbackData, prefix=CB_VERSION + "ab"):
+    pass
+
+class AdmAddProject(CallbackData, prefix=CB_VERSION + "ap"):
+    pass
+
+class AdmPrices(CallbackData, prefix=CB_VERSION + "pr"):
+    pass
+
+class AdmEditBalance(CallbackData, prefix=CB_VERSION + "eb"):
+    pass
+
+class SetConfig(CallbackData, prefix=CB_VERSION + "sc"):
+    key: str
+
+class PayOk(CallbackData, prefix=CB_VERSION + "pk"):
+    uid: int
+    amount_c: int # tiyinlarda (1/100 🪙), float o'rniga
+
+    @property
+    def amount(self):
+        return self.amount_c / 100
+
+class PayNo(CallbackData, prefix=CB_VERSION + "pn"):
+    uid: int
+
+
+# --- ESKI FORMAT ---
+# Faqat dict lookup topolmaganda ishlaydi (yangi tugmalar bu yerga tushmaydi)
+LEGACY_EXACT = {
+    "transfer_start": TransferStart,
+    "clicker_process": Click,
+    "open_status_shop": StatusShop,
+    "adm_broadcast": AdmBroadcast,
+    "adm_add_proj": AdmAddProject,
+    "adm_prices": AdmPrices,
+    "adm_edit_bal": AdmEditBalance,
+}
+
+def parse_legacy(data):
+    if data in LEGACY_EXACT:
+        return LEGACY_EXACT[data]()
+    if data.startswith("buy_status_"):
+        return BuyStatus(level=int(data.split("_")[-1]))
+    if data.startswith("view_proj_"):
+        return ViewProject(pid=int(data.split("_")[-1]))
+    if data.startswith("buy_proj_"):
+        return BuyProject(pid=int(data.split("_")[-1]))
+    if data.startswith("serv_"):
+        return Service(kind=data.split("_")[1])
+    if data.startswith("set_"):
+        return SetConfig(key=data.replace("set_", "", 1))
+    if data.startswith("p_ok:"):
+        parts = data.split(":")
+        if len(parts) != 3: return None
+        return PayOk(uid=int(parts[1]), amount_c=round(float(parts[2]) * 100))
+    if data.startswith("p_no:"):
+        parts = data.split(":")
+        if len(parts) != 2: return None
+        return PayNo(uid=int(parts[1]))
+    return None
+
+
+# --- ROUTER ---
+class CallbackRouter:
+    def __init__(self):
+        self.routes = {} # prefiks -> (CallbackData klassi, handler, state kerakmi)
+
+    def route(self, cb_cls):
+        def decorator(handler):
+            prefix = cb_cls.__prefix__
+            if prefix in self.routes:
+                raise ValueError(f"Callback prefiks takrorlandi: {prefix}")
+            wants_state = "state" in inspect.signature(handler).parameters
+            self.routes[prefix] = (cb_cls, handler, wants_state)
+            return handler
+        return decorator
+
+    def resolve(self, data):
+        """(route, parse qilingan obyekt) yoki (None, None)."""
+        route = self.routes.get(data.partition(":")[0])
+        try:
+            if route is not None:
+                return route, route[0].unpack(data)
+            parsed = parse_legacy(data)
+        except (ValueError, TypeError, IndexError, OverflowError):
+            logging.warning(f"Noto'g'ri callback data: {data!r}")
+            return None, None
+        if parsed is None:
+            return None, None
+        return self.routes.get(parsed.__prefix__), parsed
+
+    async def dispatch(self, callback, state):
+        route, callback_data = self.resolve(callback.data or "")
+        if route is None:
+            # Handler yo'q - hech bo'lmasa tugmadagi "soat"ni to'xtatamiz
+            return await callback.answer()
+        _, handler, wants_state = route
+        if wants_state:
+            return await handler(callback, callback_data, state=state)
+        return await handler(callback, callback_data)
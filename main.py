@@ -1,14 +1,24 @@
 import os
 import logging
-import sqlite3
 import datetime
 import asyncio
+import multiprocessing
+import time
+from decimal import Decimal, InvalidOperation
+import signal
+from collections import deque
+from queue import Empty
 from aiogram import Bot, Dispatcher, types, F
 from aiogram.filters import Command, CommandStart, CommandObject, StateFilter
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 from aiogram.types import (ReplyKeyboardMarkup, KeyboardButton, 
                            InlineKeyboardMarkup, InlineKeyboardButton, ReplyKeyboardRemove, FSInputFile)
+from storage import create_storage
+from callbacks import (CallbackRouter, TransferStart, Click, StatusShop, BuyStatus, ViewProject, BuyProject,
+                       Service, AdmBroadcast, AdmAddProject, AdmPrices, AdmEditBalance, SetConfig, PayOk, PayNo)
 
 # --- KONFIGURATSIYA ---
 API_TOKEN = os.getenv("BOT_TOKEN")
@@ -25,72 +35,95 @@ CARD_UZS = os.getenv("CARD_UZS", "5614686817322558")
 CARD_NAME = os.getenv("CARD_NAME", "Sayfullayev Sherali")
 CARD_VISA = os.getenv("CARD_VISA", "4176550026725055")
 
+# Shardli rejim: WORKERS > 1 bo'lsa supervisor N ta worker jarayon ishga tushiradi
+WORKERS = int(os.getenv("WORKERS", "1"))
+# Lokal Bot API server (yoki test uchun soxta API) manzili
+BOT_API_URL = os.getenv("BOT_API_URL")
+# Bitta to'lov so'rovining yuqori chegarasi (🪙)
+TOPUP_MAX = Decimal(os.getenv("TOPUP_MAX", "1000000"))
+# Clicker mukofotlari shu oraliqda (soniya) bitta tranzaksiyada yoziladi
+DB_FLUSH_INTERVAL = float(os.getenv("DB_FLUSH_INTERVAL", "1.0"))
+
 logging.basicConfig(level=logging.INFO)
-bot = Bot(token=API_TOKEN)
+if BOT_API_URL:
+    bot = Bot(token=API_TOKEN, session=AiohttpSession(api=TelegramAPIServer.from_base(BOT_API_URL)))
+else:
+    bot = Bot(token=API_TOKEN)
 dp = Dispatcher()
+cb_router = CallbackRouter() # barcha callback tugmalar shu orqali (qarang: callbacks.py)
+BOT_USERNAME = None # main() da bir marta olinadi
 
 # --- BAZA BILAN ISHLASH ---
-def db_query(query, params=(), fetchone=False, fetchall=False, commit=False):
-    try:
-        with sqlite3.connect(DB_NAME) as conn:
-            cursor = conn.cursor()
-            cursor.execute(query, params)
-            if commit: conn.commit()
-            if fetchone: return cursor.fetchone()
-            if fetchall: return cursor.fetchall()
-            return None
-    except Exception as e:
-        logging.error(f"Bazada xatolik: {e}")
-        return None
-
-def init_db():
-    with sqlite3.connect(DB_NAME) as conn:
-        cursor = conn.cursor()
-        cursor.execute('''CREATE TABLE IF NOT EXISTS users 
-                          (id INTEGER PRIMARY KEY, 
-                           balance REAL DEFAULT 0.0,
-                           status_level INTEGER DEFAULT 0,
-                           status_expire TEXT,
-                           referrer_id INTEGER,
-                           joined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''') # joined_at qo'shildi
-
-        cursor.execute('''CREATE TABLE IF NOT EXISTS config 
-                          (key TEXT PRIMARY KEY, value TEXT)''')
-        
-        cursor.execute('''CREATE TABLE IF NOT EXISTS projects 
-                          (id INTEGER PRIMARY KEY AUTOINCREMENT, 
-                           name TEXT, 
-                           price REAL, 
-                           description TEXT,
-                           media_id TEXT,
-                           media_type TEXT,
-                           file_id TEXT)''')
-        conn.commit()
-    
-    # Migratsiyalar (xatolik bo'lmasligi uchun)
-    columns = ["description", "media_id", "media_type"]
-    for col in columns:
-        try: db_query(f"ALTER TABLE projects ADD COLUMN {col} TEXT", commit=True)
-        except: pass
-    
-    try: db_query("ALTER TABLE users ADD COLUMN status_level INTEGER DEFAULT 0", commit=True)
-    except: pass
-    try: db_query("ALTER TABLE users ADD COLUMN referrer_id INTEGER", commit=True)
-    except: pass
-    try: db_query("ALTER TABLE users ADD COLUMN joined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP", commit=True)
-    except: pass
-
-init_db()
+# Backend STORAGE env orqali tanlanadi (sqlite/memory/postgres), qarang: storage.py
+storage = create_storage(db_name=DB_NAME)
+
+# --- YOZUVLARNI GURUHLASH (BATCH) ---
+# Clicker har bosishda alohida UPDATE qilmaydi: mukofot xotirada yig'iladi va
+# DB_FLUSH_INTERVAL da bir marta bitta tranzaksiyada yoziladi. Har bir user doim
+# bitta shardga tushgani uchun get_user_data() yozilmagan qismni ham hisobga oladi.
+# Bu kafolat faqat bitta xost ichida bor - ko'p nodeli backendda (postgres) o'chiriladi.
+BATCH_CREDITS = storage.single_host
+PENDING_CREDITS = {}
+# Summa PENDING_CREDITS dan faqat bazaga yozilgandan keyin olinadi. Yozish paytida
+# o'qilgan balans (bazadagi + xotiradagi) noto'g'ri bo'lishi mumkin, shuning uchun
+# flush davomida FLUSH_SEQ toq bo'ladi va get_user_data() o'qishni takrorlaydi.
+FLUSH_LOCK = asyncio.Lock()
+FLUSH_SEQ = 0
+
+def add_balance_batched(user_id, amount):
+    PENDING_CREDITS[user_id] = PENDING_CREDITS.get(user_id, 0.0) + amount
+
+async def flush_credits():
+    global FLUSH_SEQ
+    async with FLUSH_LOCK:
+        if not PENDING_CREDITS: return
+        batch = list(PENDING_CREDITS.items())
+        FLUSH_SEQ += 1
+        try:
+            await storage.add_balances(batch)
+            for uid, amount in batch:
+                # Yozish paytida yangi bosishlar qo'shilgan bo'lsa, faqat ular qoladi
+                if PENDING_CREDITS[uid] == amount: del PENDING_CREDITS[uid]
+                else: PENDING_CREDITS[uid] -= amount
+        except Exception as e:
+            # Yozilmaganlar PENDING_CREDITS da qoladi, keyingi safar yana urinamiz
+            logging.error(f"Bazada xatolik (batch): {e}")
+        finally:
+            FLUSH_SEQ += 1
+
+async def credits_flusher():
+    while True:
+        await asyncio.sleep(DB_FLUSH_INTERVAL)
+        # shield: to'xtatishda yozish yarim yo'lda uzilmaydi (aks holda batch ikki marta yozilishi mumkin)
+        await asyncio.shield(flush_credits())
 
 # --- SOZLAMALAR ---
-def get_config(key, default_value):
-    res = db_query("SELECT value FROM config WHERE key = ?", (key,), fetchone=True)
-    if res: return res[0]
-    db_query("INSERT INTO config (key, value) VALUES (?, ?)", (key, str(default_value)), commit=True)
-    return str(default_value)
-
-def set_config(key, value):
-    db_query("INSERT OR REPLACE INTO config (key, value) VALUES (?, ?)", (key, str(value)), commit=True)
+async def get_config(key, default_value):
+    return await storage.get_config(key, default_value)
+
+async def set_config(key, value):
+    # Backend config versiyasini ham oshiradi - eski render keshi barcha worker va nodelarda yaroqsiz bo'ladi
+    await storage.set_config(key, value)
+
+# --- RENDER KESH ---
+# Statik va configdan yasaladigan xabar/klaviaturalar har bosishda qayta qurilmaydi.
+# Kalit: (nom, config versiyasi, status darajasi). Versiya bazada saqlanadi va har
+# renderda o'qiladi (bitta kichik so'rov), shuning uchun boshqa node dagi o'zgarish ham ko'rinadi.
+RENDER_CACHE = {}
+RENDER_CACHE_VERSION = 0
+
+async def cached_render(name, builder, level=0):
+    global RENDER_CACHE_VERSION
+    version = await storage.get_config_version()
+    if version != RENDER_CACHE_VERSION:
+        RENDER_CACHE.clear()
+        RENDER_CACHE_VERSION = version
+    key = (name, version, level)
+    res = RENDER_CACHE.get(key)
+    if res is None:
+        res = await builder()
+        RENDER_CACHE[key] = res
+    return res
 
 # Status darajalari: 0=Start, 1=Silver, 2=Gold, 3=Platinum (Rebranding)
 STATUS_DATA = {
@@ -100,44 +133,51 @@ STATUS_DATA = {
     3: {"name": "💎 Platinum", "limit": 100000, "desc": "✅ Hammasi TEKIN (Xizmatlar ham)\n✅ Limit: 100000 🪙"} 
 }
 
-def get_dynamic_prices():
+async def get_dynamic_prices():
     return {
-        "web": float(get_config("price_web", 50.0)),
-        "apk": float(get_config("price_apk", 100.0)),
-        "bot": float(get_config("price_bot", 30.0)),
-        "ref_reward": float(get_config("ref_reward", 1.0)),
-        "click_reward": float(get_config("click_reward", 0.05)),
+        "web": float(await get_config("price_web", 50.0)),
+        "apk": float(await get_config("price_apk", 100.0)),
+        "bot": float(await get_config("price_bot", 30.0)),
+        "ref_reward": float(await get_config("ref_reward", 1.0)),
+        "click_reward": float(await get_config("click_reward", 0.05)),
         # Status narxlari (Oyiga)
-        "pro_price": float(get_config("status_price_1", 20.0)),  # Silver
-        "prem_price": float(get_config("status_price_2", 50.0)), # Gold
-        "king_price": float(get_config("status_price_3", 200.0)) # Platinum
+        "pro_price": float(await get_config("status_price_1", 20.0)),  # Silver
+        "prem_price": float(await get_config("status_price_2", 50.0)), # Gold
+        "king_price": float(await get_config("status_price_3", 200.0)) # Platinum
     }
 
-def get_coin_rates():
+async def get_coin_rates():
     return {
-        "uzs": float(get_config("rate_uzs", 1000.0)), # 1 🪙 = 1000 so'm
-        "usd": float(get_config("rate_usd", 0.1))
+        "uzs": float(await get_config("rate_uzs", 1000.0)), # 1 🪙 = 1000 so'm
+        "usd": float(await get_config("rate_usd", 0.1))
     }
 
-def get_text(key, default):
+async def get_text(key, default):
     # Bu yerda SultanCoin ni ham almashtiramiz
     modified_default = default.replace("UzCoin", "🪙").replace("COIN", "🪙").replace("UZC", "🪙").replace("SultanCoin", "🪙")
     
-    res = get_config(f"text_{key}", modified_default).replace("\\n", "\n")
+    res = (await get_config(f"text_{key}", modified_default)).replace("\\n", "\n")
     # Bazadan olingan matndagi UzCoin, COIN, UZC, SultanCoin ni 🪙 ga almashtirish
     res = res.replace("UzCoin", "🪙").replace("COIN", "🪙").replace("UZC", "🪙").replace("SultanCoin", "🪙")
     return res
 
 
-def get_user_data(user_id):
-    res = db_query("SELECT balance, status_level, status_expire FROM users WHERE id = ?", (user_id,), fetchone=True)
+async def get_user_data(user_id):
+    while True:
+        seq = FLUSH_SEQ
+        if seq % 2:
+            async with FLUSH_LOCK: pass # flush tugashini kutamiz
+            continue
+        res = await storage.get_user(user_id)
+        if seq == FLUSH_SEQ: break
     if not res: return None
     
     balance, level, expire = res
+    balance += PENDING_CREDITS.get(user_id, 0.0)
     if expire:
         expire_dt = datetime.datetime.strptime(expire, "%Y-%m-%d %H:%M:%S")
         if datetime.datetime.now() > expire_dt:
-            db_query("UPDATE users SET status_level = 0, status_expire = NULL WHERE id = ?", (user_id,), commit=True)
+            await storage.reset_status(user_id)
             level = 0
             expire = None
     return {"balance": balance, "level": level, "expire": expire}
@@ -173,18 +213,22 @@ class MoneyTransfer(StatesGroup):
     confirm = State()
 
 # --- KEYBOARDS ---
+# Statik klaviaturalar bir marta yaratiladi
+MAIN_MENU_KB = ReplyKeyboardMarkup(keyboard=[
+    [KeyboardButton(text="👤 Kabinet"), KeyboardButton(text="🌟 Statuslar")],
+    [KeyboardButton(text="🛠 Xizmatlar"), KeyboardButton(text="📂 Loyihalar")],
+    [KeyboardButton(text="💳 Hisobni to'ldirish"), KeyboardButton(text="💸 Pul ishlash")],
+    [KeyboardButton(text="🏆 Top Foydalanuvchilar")]
+], resize_keyboard=True)
+
+CANCEL_KB = ReplyKeyboardMarkup(keyboard=[[KeyboardButton(text="🚫 Bekor qilish")]], resize_keyboard=True)
+
 def main_menu(user_id):
     # Professional menyu
-    kb = [
-        [KeyboardButton(text="👤 Kabinet"), KeyboardButton(text="🌟 Statuslar")],
-        [KeyboardButton(text="🛠 Xizmatlar"), KeyboardButton(text="📂 Loyihalar")],
-        [KeyboardButton(text="💳 Hisobni to'ldirish"), KeyboardButton(text="💸 Pul ishlash")],
-        [KeyboardButton(text="🏆 Top Foydalanuvchilar")]
-    ]
-    return ReplyKeyboardMarkup(keyboard=kb, resize_keyboard=True)
+    return MAIN_MENU_KB
 
 def cancel_kb():
-    return ReplyKeyboardMarkup(keyboard=[[KeyboardButton(text="🚫 Bekor qilish")]], resize_keyboard=True)
+    return CANCEL_KB
 
 # --------------------------------------------------------------------------------
 # --- 🔥 MUHIM FIX: BEKOR QILISH HANDLERI (ENG TEPADA) ---
@@ -203,6 +247,12 @@ async def cancel_all_handler(message: types.Message, state: FSMContext):
     await state.clear()
     await message.answer("🚫 Jarayon bekor qilindi.", reply_markup=main_menu(message.from_user.id))
 
+# --- CALLBACK ROUTER ---
+# Yagona callback handler: prefiks bo'yicha bitta dict lookup, handlerga parse qilingan obyekt beriladi
+@dp.callback_query()
+async def callback_dispatch(callback: types.CallbackQuery, state: FSMContext):
+    await cb_router.dispatch(callback, state)
+
 # --- START VA REFERAL ---
 @dp.message(CommandStart())
 async def cmd_start(message: types.Message, command: CommandObject):
@@ -213,18 +263,17 @@ async def cmd_start(message: types.Message, command: CommandObject):
         referrer_id = int(args)
         if referrer_id == message.from_user.id: referrer_id = None
     
-    if not db_query("SELECT id FROM users WHERE id = ?", (message.from_user.id,), fetchone=True):
-        db_query("INSERT INTO users (id, balance, referrer_id) VALUES (?, 0.0, ?)", 
-                 (message.from_user.id, referrer_id), commit=True)
+    if not await storage.user_exists(message.from_user.id):
+        await storage.add_user(message.from_user.id, referrer_id)
         
         if referrer_id:
-            reward = get_dynamic_prices()['ref_reward']
-            db_query("UPDATE users SET balance = balance + ? WHERE id = ?", (reward, referrer_id), commit=True)
+            reward = (await get_dynamic_prices())['ref_reward']
+            await storage.add_balance(referrer_id, reward)
             try:
                 await bot.send_message(referrer_id, f"🎉 Sizda yangi referal! +{format_num(reward)} {CURRENCY_SYMBOL}")
             except: pass
 
-    welcome_text = get_text("welcome", 
+    welcome_text = await get_text("welcome", 
                             f"👋 **Assalomu alaykum, {message.from_user.full_name}!**\n\n"
                             f"🤖 **SULTANOV Official Bot**ga xush kelibsiz.\n"
                             f"Bu yerda siz xizmatlardan foydalanishingiz va {CURRENCY_NAME} ishlashingiz mumkin.")
@@ -234,7 +283,7 @@ async def cmd_start(message: types.Message, command: CommandObject):
 # --- KABINET ---
 @dp.message(F.text == "👤 Kabinet")
 async def kabinet(message: types.Message):
-    data = get_user_data(message.from_user.id)
+    data = await get_user_data(message.from_user.id)
     status_name = STATUS_DATA[data['level']]['name']
     limit = STATUS_DATA[data['level']]['limit']
     
@@ -246,39 +295,44 @@ async def kabinet(message: types.Message):
     if data['expire']:
         msg += f"\n⏳ Tugash vaqti: `{data['expire']}`"
         
-    kb = InlineKeyboardMarkup(inline_keyboard=[[InlineKeyboardButton(text="💸 Do'stga o'tkazish", callback_data="transfer_start")]])
+    kb = InlineKeyboardMarkup(inline_keyboard=[[InlineKeyboardButton(text="💸 Do'stga o'tkazish", callback_data=TransferStart().pack())]])
     await message.answer(msg, reply_markup=kb, parse_mode="Markdown")
 
 # --- PUL ISHLASH ---
 @dp.message(F.text == "💸 Pul ishlash")
 async def earn_money(message: types.Message):
-    user = get_user_data(message.from_user.id)
-    prices = get_dynamic_prices()
-    bot_username = (await bot.get_me()).username
-    ref_link = f"https://t.me/{bot_username}?start={message.from_user.id}"
+    user = await get_user_data(message.from_user.id)
+    ref_link = f"https://t.me/{BOT_USERNAME}?start={message.from_user.id}"
     
-    msg = (f"🔗 **Referal havolangiz:**\n`{ref_link}`\n\n"
-           f"👤 Har bir taklif uchun: **{format_num(prices['ref_reward'])} {CURRENCY_SYMBOL}**\n"
+    tail, kb = await cached_render("earn", lambda: render_earn(user['level']), level=user['level'])
+    msg = f"🔗 **Referal havolangiz:**\n`{ref_link}`\n\n" + tail
+    await message.answer(msg, reply_markup=kb, parse_mode="Markdown")
+
+async def render_earn(level):
+    prices = await get_dynamic_prices()
+    msg = (f"👤 Har bir taklif uchun: **{format_num(prices['ref_reward'])} {CURRENCY_SYMBOL}**\n"
            f"ℹ️ Do'stingiz botga kirib start bossa kifoya.")
     
     kb_rows = []
-    if user['level'] >= 1:
+    if level >= 1:
         msg += f"\n\n🥈 **Silver Clicker** faol!\nHar bosishda: {format_num(prices['click_reward'])} {CURRENCY_SYMBOL}"
-        kb_rows.append([InlineKeyboardButton(text=f"👆 {CURRENCY_NAME} ISHLASH", callback_data="clicker_process")])
+        kb_rows.append([InlineKeyboardButton(text=f"👆 {CURRENCY_NAME} ISHLASH", callback_data=Click().pack())])
     else:
         msg += f"\n\n🔒 **Clicker** yopiq. Kamida Silver status oling!"
-        kb_rows.append([InlineKeyboardButton(text="🥈 Status sotib olish", callback_data="open_status_shop")])
-        
-    await message.answer(msg, reply_markup=InlineKeyboardMarkup(inline_keyboard=kb_rows), parse_mode="Markdown")
+        kb_rows.append([InlineKeyboardButton(text="🥈 Status sotib olish", callback_data=StatusShop().pack())])
+    return msg, InlineKeyboardMarkup(inline_keyboard=kb_rows)
 
-@dp.callback_query(F.data == "clicker_process")
-async def process_click(callback: types.CallbackQuery):
-    user = get_user_data(callback.from_user.id)
+@cb_router.route(Click)
+async def process_click(callback: types.CallbackQuery, callback_data: Click):
+    user = await get_user_data(callback.from_user.id)
     if user['level'] < 1:
         return await callback.answer("Faqat Silver va yuqori statusdagilar uchun!", show_alert=True)
     
-    reward = get_dynamic_prices()['click_reward']
-    db_query("UPDATE users SET balance = balance + ? WHERE id = ?", (reward, callback.from_user.id), commit=True)
+    reward = (await get_dynamic_prices())['click_reward']
+    if BATCH_CREDITS:
+        add_balance_batched(callback.from_user.id, reward)
+    else:
+        await storage.add_balance(callback.from_user.id, reward)
     await callback.answer(f"+{format_num(reward)} {CURRENCY_SYMBOL}", cache_time=1)
 
 # --- STATUSLAR DOKONI ---
@@ -286,36 +340,40 @@ async def process_click(callback: types.CallbackQuery):
 async def status_shop(message: types.Message):
     await show_status_menu(message)
 
-@dp.callback_query(F.data == "open_status_shop")
-async def cb_status_shop(callback: types.CallbackQuery):
+@cb_router.route(StatusShop)
+async def cb_status_shop(callback: types.CallbackQuery, callback_data: StatusShop):
     await show_status_menu(callback.message)
 
 async def show_status_menu(message: types.Message):
-    prices = get_dynamic_prices()
+    info, markup = await cached_render("status_menu", render_status_menu)
+    
+    if isinstance(message, types.CallbackQuery):
+        await message.message.edit_text(info, reply_markup=markup, parse_mode="Markdown")
+    else:
+        await message.answer(info, reply_markup=markup, parse_mode="Markdown")
+
+async def render_status_menu():
+    prices = await get_dynamic_prices()
     kb = [
-        [InlineKeyboardButton(text=f"🥈 Silver ({prices['pro_price']} 🪙)", callback_data="buy_status_1")], 
-        [InlineKeyboardButton(text=f"🥇 Gold ({prices['prem_price']} 🪙)", callback_data="buy_status_2")], 
-        [InlineKeyboardButton(text=f"💎 Platinum ({prices['king_price']} 🪙)", callback_data="buy_status_3")] 
+        [InlineKeyboardButton(text=f"🥈 Silver ({prices['pro_price']} 🪙)", callback_data=BuyStatus(level=1).pack())], 
+        [InlineKeyboardButton(text=f"🥇 Gold ({prices['prem_price']} 🪙)", callback_data=BuyStatus(level=2).pack())], 
+        [InlineKeyboardButton(text=f"💎 Platinum ({prices['king_price']} 🪙)", callback_data=BuyStatus(level=3).pack())] 
     ]
     
     info = (f"**🌟 STATUSLAR VA IMKONIYATLAR:**\n\n"
             f"🥈 **SILVER** - {prices['pro_price']} {CURRENCY_SYMBOL}\n{STATUS_DATA[1]['desc']}\n\n"
             f"🥇 **GOLD** - {prices['prem_price']} {CURRENCY_SYMBOL}\n{STATUS_DATA[2]['desc']}\n\n"
             f"💎 **PLATINUM** - {prices['king_price']} {CURRENCY_SYMBOL}\n{STATUS_DATA[3]['desc']}")
-    
-    if isinstance(message, types.CallbackQuery):
-        await message.message.edit_text(info, reply_markup=InlineKeyboardMarkup(inline_keyboard=kb), parse_mode="Markdown")
-    else:
-        await message.answer(info, reply_markup=InlineKeyboardMarkup(inline_keyboard=kb), parse_mode="Markdown")
+    return info, InlineKeyboardMarkup(inline_keyboard=kb)
 
-@dp.callback_query(F.data.startswith("buy_status_"))
-async def buy_status_handler(callback: types.CallbackQuery):
-    lvl = int(callback.data.split("_")[-1])
-    prices = get_dynamic_prices()
+@cb_router.route(BuyStatus)
+async def buy_status_handler(callback: types.CallbackQuery, callback_data: BuyStatus):
+    lvl = callback_data.level
+    prices = await get_dynamic_prices()
     price_map = {1: prices['pro_price'], 2: prices['prem_price'], 3: prices['king_price']}
     cost = price_map[lvl]
     
-    user = get_user_data(callback.from_user.id)
+    user = await get_user_data(callback.from_user.id)
     
     if user['level'] >= lvl:
         return await callback.answer("Sizda allaqachon bu yoki undan yuqori status bor!", show_alert=True)
@@ -325,8 +383,7 @@ async def buy_status_handler(callback: types.CallbackQuery):
     
     expire_date = (datetime.datetime.now() + datetime.timedelta(days=30)).strftime("%Y-%m-%d %H:%M:%S")
     
-    db_query("UPDATE users SET balance = balance - ?, status_level = ?, status_expire = ? WHERE id = ?", 
-             (cost, lvl, expire_date, callback.from_user.id), commit=True)
+    await storage.buy_status(callback.from_user.id, cost, lvl, expire_date)
     
     await callback.message.delete()
     await callback.message.answer(f"🎉 **Tabriklaymiz!**\nSiz **{STATUS_DATA[lvl]['name']}** statusini sotib oldingiz!\nBarcha imkoniyatlar ochildi.")
@@ -334,7 +391,7 @@ async def buy_status_handler(callback: types.CallbackQuery):
 # --- TOP USERLAR ---
 @dp.message(F.text == "🏆 Top Foydalanuvchilar")
 async def top_users(message: types.Message):
-    users = db_query("SELECT id, balance, status_level FROM users ORDER BY balance DESC LIMIT 10", fetchall=True)
+    users = await storage.top_users(10)
     msg = f"🏆 **{CURRENCY_NAME} MILLIONERLARI:**\n\n"
     
     for idx, (uid, bal, lvl) in enumerate(users, 1):
@@ -352,23 +409,23 @@ async def top_users(message: types.Message):
 # --- LOYIHALAR ---
 @dp.message(F.text == "📂 Loyihalar")
 async def show_projects(message: types.Message):
-    projs = db_query("SELECT id, name FROM projects", fetchall=True)
+    projs = await storage.list_projects()
     if not projs: return await message.answer("📂 Hozircha loyihalar yuklanmagan.")
     
     kb = []
     for pid, name in projs:
-        kb.append([InlineKeyboardButton(text=f"📁 {name}", callback_data=f"view_proj_{pid}")])
+        kb.append([InlineKeyboardButton(text=f"📁 {name}", callback_data=ViewProject(pid=pid).pack())])
     await message.answer("📥 Kerakli loyihani tanlang va yuklab oling:", reply_markup=InlineKeyboardMarkup(inline_keyboard=kb))
 
-@dp.callback_query(F.data.startswith("view_proj_"))
-async def view_project(callback: types.CallbackQuery):
-    pid = int(callback.data.split("_")[-1])
-    proj = db_query("SELECT name, price, description, media_id, media_type FROM projects WHERE id = ?", (pid,), fetchone=True)
+@cb_router.route(ViewProject)
+async def view_project(callback: types.CallbackQuery, callback_data: ViewProject):
+    pid = callback_data.pid
+    proj = await storage.get_project(pid)
     
     if not proj: return await callback.answer("Loyiha topilmadi.", show_alert=True)
-    name, price, desc, mid, mtype = proj
+    name, price, desc, mid, mtype = proj['name'], proj['price'], proj['description'], proj['media_id'], proj['media_type']
     
-    user = get_user_data(callback.from_user.id)
+    user = await get_user_data(callback.from_user.id)
     # Gold (2) statusga 50% chegirma, Platinum (3) ga tekin
     discount = 0
     if user['level'] == 2: discount = 0.5
@@ -382,7 +439,7 @@ async def view_project(callback: types.CallbackQuery):
         if final_price == 0: price_text = "**TEKIN (Status)**"
     
     caption = f"📂 **{name}**\n\n📝 {desc}\n\n💰 Narxi: {price_text}"
-    kb = InlineKeyboardMarkup(inline_keyboard=[[InlineKeyboardButton(text="📥 Sotib olish / Yuklash", callback_data=f"buy_proj_{pid}")]])
+    kb = InlineKeyboardMarkup(inline_keyboard=[[InlineKeyboardButton(text="📥 Sotib olish / Yuklash", callback_data=BuyProject(pid=pid).pack())]])
     
     try:
         if mid:
@@ -398,14 +455,14 @@ async def view_project(callback: types.CallbackQuery):
         await callback.message.answer(caption, reply_markup=kb, parse_mode="Markdown")
     await callback.answer()
 
-@dp.callback_query(F.data.startswith("buy_proj_"))
-async def buy_project_process(callback: types.CallbackQuery):
-    pid = int(callback.data.split("_")[-1])
-    proj = db_query("SELECT price, file_id, name FROM projects WHERE id = ?", (pid,), fetchone=True)
+@cb_router.route(BuyProject)
+async def buy_project_process(callback: types.CallbackQuery, callback_data: BuyProject):
+    pid = callback_data.pid
+    proj = await storage.get_project(pid)
     if not proj: return
-    price, file_id, name = proj
+    price, file_id, name = proj['price'], proj['file_id'], proj['name']
     
-    user = get_user_data(callback.from_user.id)
+    user = await get_user_data(callback.from_user.id)
     discount = 0
     if user['level'] == 2: discount = 0.5
     elif user['level'] == 3: discount = 1.0
@@ -416,7 +473,7 @@ async def buy_project_process(callback: types.CallbackQuery):
         return await callback.answer(f"Mablag' yetarli emas! Kerak: {final_price} {CURRENCY_SYMBOL}", show_alert=True)
         
     if final_price > 0:
-        db_query("UPDATE users SET balance = balance - ? WHERE id = ?", (final_price, callback.from_user.id), commit=True)
+        await storage.charge(callback.from_user.id, final_price)
         await callback.message.answer(f"✅ Xarid amalga oshdi! Hisobdan {format_num(final_price)} {CURRENCY_SYMBOL} yechildi.")
     
     await callback.message.answer_document(file_id, caption=f"✅ **{name}**\n\nFaylni muvaffaqiyatli yuklab oldingiz!")
@@ -425,21 +482,25 @@ async def buy_project_process(callback: types.CallbackQuery):
 # --- XIZMATLAR ---
 @dp.message(F.text == "🛠 Xizmatlar")
 async def services_menu(message: types.Message):
-    prices = get_dynamic_prices()
+    markup = await cached_render("services_menu", render_services_menu)
+    await message.answer("🛠 **Buyurtma turini tanlang:**\nBiz sifatli IT xizmatlarini taklif etamiz.", reply_markup=markup)
+
+async def render_services_menu():
+    prices = await get_dynamic_prices()
     kb = [
-        [InlineKeyboardButton(text=f"🌐 Web Sayt ({prices['web']} 🪙)", callback_data="serv_web")], 
-        [InlineKeyboardButton(text=f"📱 Android Ilova ({prices['apk']} 🪙)", callback_data="serv_apk")], 
-        [InlineKeyboardButton(text=f"🤖 Telegram Bot ({prices['bot']} 🪙)", callback_data="serv_bot")] 
+        [InlineKeyboardButton(text=f"🌐 Web Sayt ({prices['web']} 🪙)", callback_data=Service(kind="web").pack())], 
+        [InlineKeyboardButton(text=f"📱 Android Ilova ({prices['apk']} 🪙)", callback_data=Service(kind="apk").pack())], 
+        [InlineKeyboardButton(text=f"🤖 Telegram Bot ({prices['bot']} 🪙)", callback_data=Service(kind="bot").pack())] 
     ]
-    await message.answer("🛠 **Buyurtma turini tanlang:**\nBiz sifatli IT xizmatlarini taklif etamiz.", reply_markup=InlineKeyboardMarkup(inline_keyboard=kb))
+    return InlineKeyboardMarkup(inline_keyboard=kb)
 
-@dp.callback_query(F.data.startswith("serv_"))
-async def service_select(callback: types.CallbackQuery, state: FSMContext):
-    stype = callback.data.split("_")[1]
-    prices = get_dynamic_prices()
+@cb_router.route(Service)
+async def service_select(callback: types.CallbackQuery, callback_data: Service, state: FSMContext):
+    stype = callback_data.kind
+    prices = await get_dynamic_prices()
     cost = prices.get(stype, 0)
     
-    user = get_user_data(callback.from_user.id)
+    user = await get_user_data(callback.from_user.id)
     # Platinum status (level 3) ga xizmatlar tekin
     if user['level'] == 3:
         cost = 0
@@ -458,7 +519,7 @@ async def service_confirm(message: types.Message, state: FSMContext):
     cost = data['cost']
     
     if cost > 0:
-        db_query("UPDATE users SET balance = balance - ? WHERE id = ?", (cost, message.from_user.id), commit=True)
+        await storage.charge(message.from_user.id, cost)
         
     await bot.send_message(ADMIN_ID, 
                            f"🛠 **YANGI BUYURTMA**\n"
@@ -471,8 +532,8 @@ async def service_confirm(message: types.Message, state: FSMContext):
     await state.clear()
 
 # --- PUL O'TKAZISH ---
-@dp.callback_query(F.data == "transfer_start")
-async def transfer_start(callback: types.CallbackQuery, state: FSMContext):
+@cb_router.route(TransferStart)
+async def transfer_start(callback: types.CallbackQuery, callback_data: TransferStart, state: FSMContext):
     await callback.message.answer("🆔 Qabul qiluvchining ID raqamini kiriting:", reply_markup=cancel_kb())
     await state.set_state(MoneyTransfer.waiting_for_recipient)
 
@@ -485,11 +546,11 @@ async def transfer_id(message: types.Message, state: FSMContext):
     if rid == message.from_user.id:
         return await message.answer("⚠️ O'zingizga pul o'tkaza olmaysiz!")
 
-    if not db_query("SELECT id FROM users WHERE id = ?", (rid,), fetchone=True):
+    if not await storage.user_exists(rid):
         return await message.answer("⚠️ Bunday ID ga ega foydalanuvchi topilmadi!")
         
     await state.update_data(rid=rid)
-    user = get_user_data(message.from_user.id)
+    user = await get_user_data(message.from_user.id)
     limit = STATUS_DATA[user['level']]['limit']
     
     await message.answer(f"💰 Qancha **{CURRENCY_NAME}** o'tkazmoqchisiz?\n"
@@ -506,7 +567,7 @@ async def transfer_amount(message: types.Message, state: FSMContext):
         
     if amount <= 0: return await message.answer("⚠️ Miqdor musbat bo'lishi kerak!")
     
-    user = get_user_data(message.from_user.id)
+    user = await get_user_data(message.from_user.id)
     limit = STATUS_DATA[user['level']]['limit']
     
     if amount > limit:
@@ -518,8 +579,7 @@ async def transfer_amount(message: types.Message, state: FSMContext):
     data = await state.get_data()
     rid = data['rid']
     
-    db_query("UPDATE users SET balance = balance - ? WHERE id = ?", (amount, message.from_user.id), commit=True)
-    db_query("UPDATE users SET balance = balance + ? WHERE id = ?", (amount, rid), commit=True)
+    await storage.transfer(message.from_user.id, rid, amount)
     
     await message.answer(f"✅ **Muvaffaqiyatli!**\n`{rid}` ID ga {format_num(amount)} {CURRENCY_SYMBOL} o'tkazildi.", reply_markup=main_menu(message.from_user.id))
     try: await bot.send_message(rid, f"📥 **Sizga pul kelib tushdi!**\n+{format_num(amount)} {CURRENCY_SYMBOL}\nKimdan: ID `{message.from_user.id}`")
@@ -531,28 +591,28 @@ async def transfer_amount(message: types.Message, state: FSMContext):
 async def admin_panel(message: types.Message):
     if message.from_user.id != ADMIN_ID: return
     kb = [
-        [InlineKeyboardButton(text="➕ Loyiha Qo'shish", callback_data="adm_add_proj"),
-         InlineKeyboardButton(text="💵 Narxlar va Sozlamalar", callback_data="adm_prices")],
-        [InlineKeyboardButton(text="✏️ User Balansi", callback_data="adm_edit_bal"),
-         InlineKeyboardButton(text="📢 Broadcast (Xabar)", callback_data="adm_broadcast")]
+        [InlineKeyboardButton(text="➕ Loyiha Qo'shish", callback_data=AdmAddProject().pack()),
+         InlineKeyboardButton(text="💵 Narxlar va Sozlamalar", callback_data=AdmPrices().pack())],
+        [InlineKeyboardButton(text="✏️ User Balansi", callback_data=AdmEditBalance().pack()),
+         InlineKeyboardButton(text="📢 Broadcast (Xabar)", callback_data=AdmBroadcast().pack())]
     ]
     await message.answer("🔐 **Admin Panel v3.0 (Pro)**", reply_markup=InlineKeyboardMarkup(inline_keyboard=kb))
 
 # Broadcast (Xabar tarqatish) - YANGI
-@dp.callback_query(F.data == "adm_broadcast")
-async def adm_broadcast_start(callback: types.CallbackQuery, state: FSMContext):
+@cb_router.route(AdmBroadcast)
+async def adm_broadcast_start(callback: types.CallbackQuery, callback_data: AdmBroadcast, state: FSMContext):
     await callback.message.answer("📢 Barcha foydalanuvchilarga yuboriladigan xabarni (rasm/video/matn) yuboring:", reply_markup=cancel_kb())
     await state.set_state(AdminState.broadcast_msg)
 
 @dp.message(AdminState.broadcast_msg)
 async def adm_broadcast_send(message: types.Message, state: FSMContext):
-    users = db_query("SELECT id FROM users", fetchall=True)
+    users = await storage.all_user_ids()
     count = 0
     await message.answer(f"⏳ Xabar {len(users)} ta foydalanuvchiga yuborilmoqda...")
     
-    for user_row in users:
+    for uid in users:
         try:
-            await message.copy_to(chat_id=user_row[0])
+            await message.copy_to(chat_id=uid)
             count += 1
             await asyncio.sleep(0.05) # Telegram limitlariga tushmaslik uchun
         except: pass
@@ -561,8 +621,8 @@ async def adm_broadcast_send(message: types.Message, state: FSMContext):
     await state.clear()
 
 # Loyiha qo'shish
-@dp.callback_query(F.data == "adm_add_proj")
-async def adm_add_proj_start(callback: types.CallbackQuery, state: FSMContext):
+@cb_router.route(AdmAddProject)
+async def adm_add_proj_start(callback: types.CallbackQuery, callback_data: AdmAddProject, state: FSMContext):
     await callback.message.answer("📝 Loyiha nomini yozing:", reply_markup=cancel_kb())
     await state.set_state(AdminState.add_proj_name)
 
@@ -606,28 +666,31 @@ async def adm_p_file(message: types.Message, state: FSMContext):
     if not message.document: return await message.answer("⚠️ Fayl yuborishingiz shart!")
     data = await state.get_data()
     
-    db_query("INSERT INTO projects (name, price, description, media_id, media_type, file_id) VALUES (?,?,?,?,?,?)",
-             (data['name'], data['price'], data['desc'], data['mid'], data['mtype'], message.document.file_id), commit=True)
+    await storage.add_project(data['name'], data['price'], data['desc'], data['mid'], data['mtype'], message.document.file_id)
     
     await message.answer("✅ Loyiha bazaga qo'shildi!", reply_markup=main_menu(message.from_user.id))
     await state.clear()
 
 # Narxlar
-@dp.callback_query(F.data == "adm_prices")
-async def adm_prices_list(callback: types.CallbackQuery):
-    p = get_dynamic_prices()
+@cb_router.route(AdmPrices)
+async def adm_prices_list(callback: types.CallbackQuery, callback_data: AdmPrices):
+    markup = await cached_render("adm_prices", render_adm_prices)
+    await callback.message.edit_text("⚙️ **Narxlarni sozlash:**", reply_markup=markup)
+
+async def render_adm_prices():
+    p = await get_dynamic_prices()
     kb = [
-        [InlineKeyboardButton(text=f"Ref Bonus ({p['ref_reward']})", callback_data="set_ref_reward"),
-         InlineKeyboardButton(text=f"Click ({p['click_reward']})", callback_data="set_click_reward")],
-        [InlineKeyboardButton(text=f"Silver ({p['pro_price']})", callback_data="set_status_price_1"),
-         InlineKeyboardButton(text=f"Gold ({p['prem_price']})", callback_data="set_status_price_2")],
-        [InlineKeyboardButton(text=f"Platinum ({p['king_price']})", callback_data="set_status_price_3")]
+        [InlineKeyboardButton(text=f"Ref Bonus ({p['ref_reward']})", callback_data=SetConfig(key="ref_reward").pack()),
+         InlineKeyboardButton(text=f"Click ({p['click_reward']})", callback_data=SetConfig(key="click_reward").pack())],
+        [InlineKeyboardButton(text=f"Silver ({p['pro_price']})", callback_data=SetConfig(key="status_price_1").pack()),
+         InlineKeyboardButton(text=f"Gold ({p['prem_price']})", callback_data=SetConfig(key="status_price_2").pack())],
+        [InlineKeyboardButton(text=f"Platinum ({p['king_price']})", callback_data=SetConfig(key="status_price_3").pack())]
     ]
-    await callback.message.edit_text("⚙️ **Narxlarni sozlash:**", reply_markup=InlineKeyboardMarkup(inline_keyboard=kb))
+    return InlineKeyboardMarkup(inline_keyboard=kb)
 
-@dp.callback_query(F.data.startswith("set_"))
-async def adm_set_val(callback: types.CallbackQuery, state: FSMContext):
-    key = callback.data.replace("set_", "")
+@cb_router.route(SetConfig)
+async def adm_set_val(callback: types.CallbackQuery, callback_data: SetConfig, state: FSMContext):
+    key = callback_data.key
     await state.update_data(conf_key=key)
     await callback.message.answer(f"Yangi qiymatni yozing (Hozirgi: {key}):", reply_markup=cancel_kb())
     await state.set_state(AdminState.change_config_value)
@@ -636,12 +699,12 @@ async def adm_set_val(callback: types.CallbackQuery, state: FSMContext):
 async def adm_save_val(message: types.Message, state: FSMContext):
     try:
         val = float(message.text)
-        data = await state.get_data()
-        set_config(data['conf_key'], val)
-        await message.answer("✅ Saqlandi!", reply_markup=main_menu(message.from_user.id))
-        await state.clear()
-    except:
-        await message.answer("⚠️ Iltimos, raqam yozing.")
+    except (TypeError, ValueError):
+        return await message.answer("⚠️ Iltimos, raqam yozing.")
+    data = await state.get_data()
+    await set_config(data['conf_key'], val)
+    await message.answer("✅ Saqlandi!", reply_markup=main_menu(message.from_user.id))
+    await state.clear()
 
 # --- HISOB TO'LDIRISH ---
 @dp.message(F.text == "💳 Hisobni to'ldirish")
@@ -655,7 +718,7 @@ async def topup_start(message: types.Message, state: FSMContext):
 
 @dp.message(FillBalance.choosing_currency)
 async def topup_curr(message: types.Message, state: FSMContext):
-    rates = get_coin_rates()
+    rates = await get_coin_rates()
     
     # Text checking
     if "UZS" in message.text:
@@ -678,16 +741,23 @@ async def topup_curr(message: types.Message, state: FSMContext):
 @dp.message(FillBalance.waiting_for_amount)
 async def topup_amt(message: types.Message, state: FSMContext):
     try:
-        amt = float(message.text)
-    except: return await message.answer("⚠️ Iltimos, raqam yozing!")
+        dec = Decimal(message.text.strip())
+    except (InvalidOperation, AttributeError): return await message.answer("⚠️ Iltimos, raqam yozing!")
     
-    if amt <= 0: return await message.answer("⚠️ Musbat son yozing!")
-
+    if not dec.is_finite(): return await message.answer("⚠️ Iltimos, raqam yozing!")
+    if dec <= 0: return await message.answer("⚠️ Musbat son yozing!")
+    if dec > TOPUP_MAX: return await message.answer(f"⚠️ Bir martada ko'pi bilan {format_num(TOPUP_MAX)} {CURRENCY_SYMBOL}!")
+    # "1.500" ham qabul qilinadi - faqat tiyinga sig'maydigan qism rad etiladi
+    if dec != dec.quantize(Decimal("0.01")): return await message.answer("⚠️ Ko'pi bilan 2 ta kasr xona yozing (masalan: 10.5)!")
+
+    # Miqdor tiyinlarda saqlanadi - admin ko'rgan va tugmadagi summa bir xil bo'ladi
+    amt_c = int(dec * 100)
+    amt = amt_c / 100
     data = await state.get_data()
     total = amt * data['rate']
     txt = f"{total:,.0f} so'm" if data['curr'] == "UZS" else f"{total:.2f} $"
     
-    await state.update_data(amt=amt, txt=txt)
+    await state.update_data(amt=amt, amt_c=amt_c, txt=txt)
     await message.answer(f"💵 To'lov miqdori: **{txt}**\n\nTo'lovni amalga oshirib, chekni (skrinshot) shu yerga yuboring:", parse_mode="Markdown")
     await state.set_state(FillBalance.waiting_for_receipt)
 
@@ -695,14 +765,14 @@ async def topup_amt(message: types.Message, state: FSMContext):
 async def topup_rec(message: types.Message, state: FSMContext):
     data = await state.get_data()
     kb = InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text="✅ Tasdiqlash", callback_data=f"p_ok:{message.from_user.id}:{data['amt']}"),
-         InlineKeyboardButton(text="❌ Rad etish", callback_data=f"p_no:{message.from_user.id}")]
+        [InlineKeyboardButton(text="✅ Tasdiqlash", callback_data=PayOk(uid=message.from_user.id, amount_c=data['amt_c']).pack()),
+         InlineKeyboardButton(text="❌ Rad etish", callback_data=PayNo(uid=message.from_user.id).pack())]
     ])
     
     # Adminga yuborish
     caption = (f"📥 **YANGI TO'LOV!**\n\n"
                f"👤 User: `{message.from_user.id}`\n"
-               f"💎 So'raldi: {data['amt']} {CURRENCY_SYMBOL}\n"
+               f"💎 So'raldi: {format_num(data['amt'])} {CURRENCY_SYMBOL}\n"
                f"💵 To'lov: {data['txt']}")
     
     await bot.send_photo(ADMIN_ID, message.photo[-1].file_id, caption=caption, reply_markup=kb, parse_mode="Markdown")
@@ -710,27 +780,274 @@ async def topup_rec(message: types.Message, state: FSMContext):
     await message.answer("✅ Chek qabul qilindi! Admin tasdiqlagach hisobingiz to'ldiriladi.", reply_markup=main_menu(message.from_user.id))
     await state.clear()
 
-@dp.callback_query(F.data.startswith("p_ok:"))
-async def approve_pay(callback: types.CallbackQuery):
-    parts = callback.data.split(":")
-    uid, amt = int(parts[1]), float(parts[2])
-    db_query("UPDATE users SET balance = balance + ? WHERE id = ?", (amt, uid), commit=True)
+@cb_router.route(PayOk)
+async def approve_pay(callback: types.CallbackQuery, callback_data: PayOk):
+    uid, amt = callback_data.uid, callback_data.amount
+    await storage.add_balance(uid, amt)
     try:
         await bot.send_message(uid, f"✅ **To'lov tasdiqlandi!**\nHisobingizga +{amt} {CURRENCY_SYMBOL} qo'shildi.")
     except: pass
     await callback.message.edit_caption(caption=callback.message.caption + "\n\n✅ TASDIQLANDI")
 
-@dp.callback_query(F.data.startswith("p_no:"))
-async def reject_pay(callback: types.CallbackQuery):
-    uid = int(callback.data.split(":")[1])
+@cb_router.route(PayNo)
+async def reject_pay(callback: types.CallbackQuery, callback_data: PayNo):
+    uid = callback_data.uid
     try:
         await bot.send_message(uid, "❌ To'lovingiz rad etildi. Iltimos, admin bilan bog'laning.")
     except: pass
     await callback.message.edit_caption(caption=callback.message.caption + "\n\n❌ RAD ETILDI")
 
+# --- SHARDLI REJIM (KO'P YADRO) ---
+# Supervisor Telegramdan update larni oladi va from_user.id bo'yicha shardga yuboradi:
+# bitta userning barcha update lari doim bitta workerga tushadi (FSM holati ham o'sha yerda).
+# Har bir worker "avlodi" o'zining yangi navbatini oladi: o'lik jarayon eski navbatning
+# lockini ushlab qolgan bo'lishi mumkin, shuning uchun u navbat qayta ishlatilmaydi.
+# Telegramga offset faqat workerlar o'qib olgan update lar uchun tasdiqlanadi: supervisor
+# yiqilsa yoki o'ldirilsa, navbatda qolganlari keyingi ishga tushishda qayta keladi.
+WORKER_CHECK_INTERVAL = 1.0     # yiqilgan workerlarni tekshirish oralig'i (soniya)
+WORKER_START_TIMEOUT = 30.0     # workerlar tayyor bo'lishini shuncha kutamiz
+WORKER_MIN_UPTIME = 10.0        # bundan tez yiqilsa - ketma-ket xato (backoff oshadi)
+WORKER_RESTART_MAX_DELAY = 30.0 # qayta ishga tushirish orasidagi eng uzun pauza
+WORKER_STOP_TIMEOUT = 20.0      # to'xtashda navbatni tugatish uchun vaqt (keyin SIGKILL)
+QUEUE_POLL_TIMEOUT = 1.0        # worker navbatni shu oraliqda tekshiradi (supervisor tirikmi)
+UNREAD_MAX = 50                 # shuncha update o'qilmay turgan bo'lsa getUpdates kutadi (limit 100)
+UNREAD_WAIT = 0.05              # o'qilmagan update lar kamayishini tekshirish oralig'i
+
+def update_shard(update: types.Update, workers):
+    user = getattr(update.event, "from_user", None)
+    return user.id % workers if user else 0
+
+def queue_get(queue):
+    # None - to'xtash buyrug'i, "" - navbat bo'sh (timeout)
+    try:
+        return queue.get(timeout=QUEUE_POLL_TIMEOUT)
+    except Empty:
+        return ""
+
+def run_worker(shard, queue, consumed, ready, bot_username):
+    global BOT_USERNAME
+    BOT_USERNAME = bot_username
+    # SIGTERM/SIGINT butun jarayon guruhiga keladi: worker ularni e'tiborsiz qoldiradi va
+    # navbatni None gacha o'qiydi - to'xtashni supervisor boshqaradi (update lar yo'qolmaydi)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    asyncio.run(worker_main(shard, queue, consumed, ready))
+
+async def feed_update(update):
+    # start_polling kabi: handler xatosi log qilinadi, task ichida yo'qolib ketmaydi
+    try:
+        await dp.feed_update(bot, update)
+    except Exception:
+        logging.exception(f"Update {update.update_id} ni qayta ishlashda xatolik")
+
+async def worker_main(shard, queue, consumed, ready):
+    loop = asyncio.get_running_loop()
+    parent = multiprocessing.parent_process()
+    await storage.connect()
+    flusher = asyncio.create_task(credits_flusher())
+    tasks = set()
+    ready.value = 1
+    logging.info(f"Worker #{shard} ishga tushdi (pid={os.getpid()})")
+    try:
+        while True:
+            raw = await loop.run_in_executor(None, queue_get, queue)
+            if raw is None: break
+            if not raw:
+                # Supervisor SIGKILL bilan o'ldirilgan bo'lsa None hech qachon kelmaydi
+                if not parent.is_alive():
+                    logging.error(f"Worker #{shard}: supervisor yo'q, to'xtatilmoqda")
+                    break
+                continue
+            # Supervisor shu hisob bo'yicha offsetni tasdiqlaydi va qayta ishga tushirishda
+            # keyingilarini yangi navbatga ko'chiradi
+            consumed.value += 1
+            task = asyncio.create_task(feed_update(types.Update.model_validate_json(raw)))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+    finally:
+        if tasks: await asyncio.gather(*tasks, return_exceptions=True)
+        flusher.cancel()
+        await flush_credits()
+        await storage.close()
+        await bot.session.close()
+        logging.info(f"Worker #{shard} to'xtadi")
+
+class Shard:
+    """Bitta shard: joriy worker jarayoni, uning navbati va hali o'qilmagan bo'lishi mumkin bo'lgan update lar."""
+
+    def __init__(self, ctx, index):
+        self.ctx = ctx
+        self.index = index
+        self.sent = deque() # (update_id, json): joriy navbatga yuborilgan, worker o'qigani tasdiqlanmagan
+        self.failures = 0   # ketma-ket tez yiqilishlar soni
+        self.restart_at = None
+        self.start([])
+
+    def start(self, backlog):
+        self.queue = self.ctx.Queue()
+        # lock yo'q: o'lik worker ularni band qilib qo'ya olmaydi
+        self.consumed = self.ctx.RawValue("q", 0)
+        self.ready = self.ctx.RawValue("b", 0)
+        self.sent.clear()
+        self.acked = 0
+        for update_id, raw in backlog:
+            self.put(update_id, raw)
+        self.proc = self.ctx.Process(target=run_worker, name=f"worker-{self.index}",
+                                     args=(self.index, self.queue, self.consumed, self.ready, BOT_USERNAME),
+                                     daemon=True)
+        self.started_at = time.monotonic()
+        self.restart_at = None
+        self.proc.start()
+
+    def prune(self):
+        # Worker o'qigan update larni eslab qolish shart emas
+        while self.sent and self.consumed.value > self.acked:
+            self.sent.popleft()
+            self.acked += 1
+
+    def first_unread(self):
+        """Worker hali o'qimagan eng kichik update_id (hammasi o'qilgan bo'lsa None)."""
+        self.prune()
+        return self.sent[0][0] if self.sent else None
+
+    def put(self, update_id, raw):
+        self.prune()
+        self.sent.append((update_id, raw))
+        self.queue.put(raw)
+
+    def abandon_queue(self):
+        # O'quvchisi yo'q navbat: feeder thread unga yozolmay jarayonni to'xtatib qo'ymasin
+        self.queue.cancel_join_thread()
+        self.queue.close()
+
+    def schedule_restart(self, now):
+        # Tayyor bo'lmasdan (yoki tez orada) yiqilayotgan worker uchun pauza ikki barobardan oshadi
+        if not self.ready.value or now - self.started_at < WORKER_MIN_UPTIME:
+            self.failures += 1
+        else:
+            self.failures = 0
+        delay = min(2 ** (self.failures - 1), WORKER_RESTART_MAX_DELAY) if self.failures else 0
+        self.restart_at = now + delay
+        logging.error(f"Worker #{self.index} to'xtadi (exitcode={self.proc.exitcode}), "
+                      f"{delay:g} soniyadan keyin qayta ishga tushiriladi")
+
+    def restart(self):
+        self.prune()
+        backlog = list(self.sent)
+        self.abandon_queue()
+        logging.info(f"Worker #{self.index} qayta ishga tushirilmoqda ({len(backlog)} ta update ko'chirildi)")
+        self.start(backlog)
+
+async def watch_workers(shards):
+    while True:
+        await asyncio.sleep(WORKER_CHECK_INTERVAL)
+        now = time.monotonic()
+        for shard in shards:
+            if shard.proc.is_alive(): continue
+            if shard.restart_at is None:
+                shard.schedule_restart(now)
+            if now >= shard.restart_at:
+                shard.restart()
+
+def confirmed_offset(shards, next_offset):
+    # Telegram offsetdan oldingi hamma update ni o'chiradi - birorta shard o'qimagani qolmasin.
+    # Yiqilgan shard qayta ishga tushguncha yangi update lar ham to'xtab turadi (getUpdates limiti 100).
+    unread = [update_id for update_id in (shard.first_unread() for shard in shards) if update_id is not None]
+    return min(unread, default=next_offset)
+
+async def stop_workers(shards):
+    loop = asyncio.get_running_loop()
+    alive = [shard for shard in shards if shard.proc.is_alive()]
+    for shard in shards:
+        if shard in alive: shard.queue.put(None)
+        else: shard.abandon_queue()
+    deadline = loop.time() + WORKER_STOP_TIMEOUT
+    for shard in alive:
+        await loop.run_in_executor(None, shard.proc.join, max(deadline - loop.time(), 0))
+        if shard.proc.is_alive():
+            logging.error(f"Worker #{shard.index} {WORKER_STOP_TIMEOUT:g} soniyada to'xtamadi, o'ldirilmoqda")
+            shard.proc.kill()
+            await loop.run_in_executor(None, shard.proc.join)
+            shard.abandon_queue()
+
+async def supervisor_main(workers):
+    ctx = multiprocessing.get_context("spawn")
+    loop = asyncio.get_running_loop()
+    # SIGTERM/SIGINT: asosiy task bir marta bekor qilinadi, pastdagi finally workerlarni to'xtatadi
+    main_task = asyncio.current_task()
+    def on_signal():
+        if not main_task.cancelling(): main_task.cancel()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, on_signal)
+    shards = [Shard(ctx, index) for index in range(workers)]
+    # Tayyor bo'lmasdan yiqilgan workerni ham watcher qayta ishga tushiradi
+    watcher = asyncio.create_task(watch_workers(shards))
+
+    next_offset = None # hali hech bir shardga yuborilmagan birinchi update_id
+    offset = None      # Telegramga oxirgi marta tasdiqlangan offset
+    allowed = dp.resolve_used_update_types()
+    try:
+        # Biror worker yiqilsa kutish to'xtaydi: qolgan shardlar ishlashni boshlayveradi
+        deadline = loop.time() + WORKER_START_TIMEOUT
+        while (not all(shard.ready.value for shard in shards) and all(shard.proc.is_alive() for shard in shards)
+               and loop.time() < deadline):
+            await asyncio.sleep(0.1)
+        print(f"Supervisor: {sum(bool(shard.ready.value) for shard in shards)}/{workers} ta worker tayyor")
+        while True:
+            offset = confirmed_offset(shards, next_offset)
+            # Tasdiqlanmagan update lar har getUpdates da qayta keladi - ular ko'p bo'lsa
+            # so'rov deyarli faqat takrorlarni olib, workerlarga kerak CPU ni yeydi
+            if next_offset is not None and next_offset - offset >= UNREAD_MAX:
+                await asyncio.sleep(UNREAD_WAIT)
+                continue
+            try:
+                updates = await bot.get_updates(offset=offset, timeout=10, allowed_updates=allowed)
+            except Exception as e:
+                logging.error(f"get_updates xatolik: {e}")
+                await asyncio.sleep(1)
+                continue
+            # Tasdiqlanmagan (navbatda turgan) update lar qayta keladi - ular ikkinchi marta yuborilmaydi
+            fresh = [update for update in updates if next_offset is None or update.update_id >= next_offset]
+            for update in fresh:
+                shards[update_shard(update, workers)].put(update.update_id,
+                                                          update.model_dump_json(exclude_unset=True, by_alias=True))
+                next_offset = update.update_id + 1
+            if updates and not fresh:
+                await asyncio.sleep(UNREAD_WAIT)
+    except asyncio.CancelledError:
+        logging.info("Supervisor to'xtatilmoqda...")
+    finally:
+        watcher.cancel()
+        await stop_workers(shards)
+        # Workerlar o'qib bo'lgan update larni tasdiqlaymiz - qayta ishga tushganda takrorlanmaydi
+        final = confirmed_offset(shards, next_offset)
+        if final != offset:
+            try:
+                await bot.get_updates(offset=final, timeout=0, limit=1, allowed_updates=allowed)
+            except Exception as e:
+                logging.error(f"Offsetni tasdiqlab bo'lmadi: {e}")
+        await bot.session.close()
+
 async def main():
+    global BOT_USERNAME
+    if WORKERS > 1 and not storage.shared:
+        raise SystemExit(f"STORAGE={type(storage).__name__} har bir jarayonda alohida: WORKERS > 1 bilan ishlatib bo'lmaydi")
+    await storage.connect()
+    # Bot identifikatsiyasi bir marta olinadi (har bosishda get_me() chaqirilmaydi)
+    BOT_USERNAME = (await bot.get_me()).username
     print(f"Bot ishga tushdi... {CURRENCY_NAME}")
-    await dp.start_polling(bot)
+    if WORKERS > 1:
+        try:
+            return await supervisor_main(WORKERS)
+        finally:
+            await storage.close()
+    flusher = asyncio.create_task(credits_flusher())
+    try:
+        await dp.start_polling(bot)
+    finally:
+        flusher.cancel()
+        await flush_credits()
+        await storage.close()
 
 if __name__ == "__main__":
     asyncio.run(main())
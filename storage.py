@@ -0,0 +1,435 @@
+"""Ma'lumotlar ombori (storage) backendlari.
+
+Handlerlar SQL yozmaydi: ular faqat `Storage` interfeysini chaqiradi. Uchta backend bor:
+  - SQLiteStorage   - standart, bitta fayl (WAL rejimida)
+  - MemoryStorage   - xotirada, testlar va benchmarklar uchun
+  - PostgresStorage - asyncpg, connection pool bilan (bir nechta node uchun)
+
+Backend STORAGE env orqali tanlanadi: sqlite (standart), memory, postgres.
+"""
+import asyncio
+import os
+import sqlite3
+from abc import ABC, abstractmethod
+
+# Config versiyasi shu kalit ostida saqlanadi; set_config() uni oshiradi (render kesh uchun)
+CONFIG_VERSION_KEY = "_config_version"
+
+
+class Storage(ABC):
+    """Barcha backendlar uchun umumiy interfeys.
+
+    users qatori: (balance, status_level, status_expire); top_users: (id, balance, status_level);
+    loyiha: dict (id, name, price, description, media_id, media_type, file_id).
+
+    Xatoliklar: barcha backendlarda metodlar xatolikni yutmaydi, balki ko'taradi (raise).
+    Topilmagan user/loyiha xatolik emas - get_user()/get_project() None qaytaradi.
+    """
+
+    # Ma'lumot barcha jarayonlarga ko'rinadimi (WORKERS > 1 uchun shart)
+    shared = True
+    # Faqat bitta xostdan foydalaniladimi. Bir nechta node bo'lsa "bitta user - bitta shard"
+    # kafolati yo'q, shuning uchun clicker mukofotlari xotirada yig'ilmaydi.
+    single_host = True
+
+    async def connect(self): pass
+    async def close(self): pass
+
+    # --- USERS ---
+    @abstractmethod
+    async def user_exists(self, user_id): ...
+    @abstractmethod
+    async def add_user(self, user_id, referrer_id=None): ...
+    @abstractmethod
+    async def get_user(self, user_id): ...
+    @abstractmethod
+    async def reset_status(self, user_id): ...
+    @abstractmethod
+    async def top_users(self, limit=10): ...
+    @abstractmethod
+    async def all_user_ids(self): ...
+
+    # --- CONFIG ---
+    @abstractmethod
+    async def get_config(self, key, default_value): ...
+    @abstractmethod
+    async def set_config(self, key, value): ... # config versiyasini ham oshiradi
+    @abstractmethod
+    async def get_config_version(self): ...
+
+    # --- PROJECTS ---
+    @abstractmethod
+    async def list_projects(self): ...
+    @abstractmethod
+    async def get_project(self, project_id): ...
+    @abstractmethod
+    async def add_project(self, name, price, description, media_id, media_type, file_id): ...
+
+    # --- PUL OPERATSIYALARI ---
+    @abstractmethod
+    async def add_balance(self, user_id, amount): ...
+    @abstractmethod
+    async def add_balances(self, credits): ... # [(user_id, amount), ...] bitta tranzaksiyada
+    @abstractmethod
+    async def charge(self, user_id, amount): ...
+    @abstractmethod
+    async def buy_status(self, user_id, cost, level, expire): ...
+    @abstractmethod
+    async def transfer(self, from_id, to_id, amount): ...
+
+
+PROJECT_FIELDS = ("id", "name", "price", "description", "media_id", "media_type", "file_id")
+
+
+# --------------------------------------------------------------------------------
+# --- SQLITE ---
+# --------------------------------------------------------------------------------
+class SQLiteStorage(Storage):
+    """sqlite3 bloklovchi, shuning uchun har bir so'rov alohida threadda bajariladi:
+    band bazani kutish (busy timeout) worker ning event loopini to'xtatib qo'ymaydi."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def _query(self, query, params=(), fetchone=False, fetchall=False, many=False):
+        with sqlite3.connect(self.path) as conn:
+            cursor = conn.cursor()
+            if many: cursor.executemany(query, params)
+            else: cursor.execute(query, params)
+            if fetchone: return cursor.fetchone()
+            if fetchall: return cursor.fetchall()
+            return None
+
+    async def _run(self, query, params=(), **kwargs):
+        return await asyncio.to_thread(self._query, query, params, **kwargs)
+
+    def _init_db(self):
+        with sqlite3.connect(self.path) as conn:
+            cursor = conn.cursor()
+            # WAL: bir nechta worker jarayon bitta bazani o'qiy oladi, yozuvchi o'quvchilarni to'sib qo'ymaydi
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute('''CREATE TABLE IF NOT EXISTS users
+                              (id INTEGER PRIMARY KEY,
+                               balance REAL DEFAULT 0.0,
+                               status_level INTEGER DEFAULT 0,
+                               status_expire TEXT,
+                               referrer_id INTEGER,
+                               joined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
+
+            cursor.execute('''CREATE TABLE IF NOT EXISTS config
+                              (key TEXT PRIMARY KEY, value TEXT)''')
+
+            cursor.execute('''CREATE TABLE IF NOT EXISTS projects
+                              (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                               name TEXT,
+                               price REAL,
+                               description TEXT,
+                               media_id TEXT,
+                               media_type TEXT,
+                               file_id TEXT)''')
+            conn.commit()
+
+        # Migratsiyalar (eski bazalar uchun; ustun allaqachon bo'lsa o'tkazib yuboriladi)
+        migrations = [f"ALTER TABLE projects ADD COLUMN {col} TEXT" for col in ["description", "media_id", "media_type"]]
+        migrations += ["ALTER TABLE users ADD COLUMN status_level INTEGER DEFAULT 0",
+                       "ALTER TABLE users ADD COLUMN referrer_id INTEGER",
+                       "ALTER TABLE users ADD COLUMN joined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP"]
+        for sql in migrations:
+            try: self._query(sql)
+            except sqlite3.OperationalError as e:
+                if "duplicate column" not in str(e): raise
+
+    async def connect(self):
+        await asyncio.to_thread(self._init_db)
+
+    # --- USERS ---
+    async def user_exists(self, user_id):
+        return await self._run("SELECT id FROM users WHERE id = ?", (user_id,), fetchone=True) is not None
+
+    async def add_user(self, user_id, referrer_id=None):
+        await self._run("INSERT OR IGNORE INTO users (id, balance, referrer_id) VALUES (?, 0.0, ?)", (user_id, referrer_id))
+
+    async def get_user(self, user_id):
+        return await self._run("SELECT balance, status_level, status_expire FROM users WHERE id = ?", (user_id,), fetchone=True)
+
+    async def reset_status(self, user_id):
+        await self._run("UPDATE users SET status_level = 0, status_expire = NULL WHERE id = ?", (user_id,))
+
+    async def top_users(self, limit=10):
+        return await self._run("SELECT id, balance, status_level FROM users ORDER BY balance DESC LIMIT ?", (limit,), fetchall=True)
+
+    async def all_user_ids(self):
+        return [row[0] for row in await self._run("SELECT id FROM users", fetchall=True)]
+
+    # --- CONFIG ---
+    async def get_config(self, key, default_value):
+        res = await self._run("SELECT value FROM config WHERE key = ?", (key,), fetchone=True)
+        if res: return res[0]
+        # OR IGNORE: boshqa worker shu paytda yozgan bo'lishi mumkin
+        await self._run("INSERT OR IGNORE INTO config (key, value) VALUES (?, ?)", (key, str(default_value)))
+        return str(default_value)
+
+    def _set_config(self, key, value):
+        with sqlite3.connect(self.path) as conn:
+            conn.execute("INSERT OR REPLACE INTO config (key, value) VALUES (?, ?)", (key, str(value)))
+            conn.execute("INSERT INTO config (key, value) VALUES (?, '1') "
+                         "ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1", (CONFIG_VERSION_KEY,))
+            conn.commit()
+
+    async def set_config(self, key, value):
+        await asyncio.to_thread(self._set_config, key, value)
+
+    async def get_config_version(self):
+        res = await self._run("SELECT value FROM config WHERE key = ?", (CONFIG_VERSION_KEY,), fetchone=True)
+        return int(res[0]) if res else 0
+
+    # --- PROJECTS ---
+    async def list_projects(self):
+        return await self._run("SELECT id, name FROM projects", fetchall=True)
+
+    async def get_project(self, project_id):
+        row = await self._run(f"SELECT {', '.join(PROJECT_FIELDS)} FROM projects WHERE id = ?", (project_id,), fetchone=True)
+        return dict(zip(PROJECT_FIELDS, row)) if row else None
+
+    async def add_project(self, name, price, description, media_id, media_type, file_id):
+        await self._run("INSERT INTO projects (name, price, description, media_id, media_type, file_id) VALUES (?,?,?,?,?,?)",
+                        (name, price, description, media_id, media_type, file_id))
+
+    # --- PUL OPERATSIYALARI ---
+    async def add_balance(self, user_id, amount):
+        await self._run("UPDATE users SET balance = balance + ? WHERE id = ?", (amount, user_id))
+
+    async def add_balances(self, credits):
+        await self._run("UPDATE users SET balance = balance + ? WHERE id = ?",
+                        [(amount, uid) for uid, amount in credits], many=True)
+
+    async def charge(self, user_id, amount):
+        await self._run("UPDATE users SET balance = balance - ? WHERE id = ?", (amount, user_id))
+
+    async def buy_status(self, user_id, cost, level, expire):
+        await self._run("UPDATE users SET balance = balance - ?, status_level = ?, status_expire = ? WHERE id = ?",
+                        (cost, level, expire, user_id))
+
+    async def transfer(self, from_id, to_id, amount):
+        # Ikkala UPDATE bitta tranzaksiyada
+        await self._run("UPDATE users SET balance = balance + ? WHERE id = ?",
+                        [(-amount, from_id), (amount, to_id)], many=True)
+
+
+# --------------------------------------------------------------------------------
+# --- XOTIRA (TEST / BENCHMARK) ---
+# --------------------------------------------------------------------------------
+class MemoryStorage(Storage):
+    """Hamma narsa xotirada. Jarayon to'xtasa ma'lumot yo'qoladi; har bir jarayon o'z nusxasini ko'radi."""
+
+    shared = False # shardli rejimda (WORKERS > 1) ishlatib bo'lmaydi
+
+    def __init__(self):
+        self.users = {}
+        self.config = {}
+        self.config_version = 0
+        self.projects = {}
+        self.next_project_id = 1
+
+    # --- USERS ---
+    async def user_exists(self, user_id):
+        return user_id in self.users
+
+    async def add_user(self, user_id, referrer_id=None):
+        if user_id in self.users: return
+        self.users[user_id] = {"balance": 0.0, "status_level": 0, "status_expire": None, "referrer_id": referrer_id}
+
+    async def get_user(self, user_id):
+        u = self.users.get(user_id)
+        if not u: return None
+        return (u["balance"], u["status_level"], u["status_expire"])
+
+    async def reset_status(self, user_id):
+        if user_id in self.users:
+            self.users[user_id].update(status_level=0, status_expire=None)
+
+    async def top_users(self, limit=10):
+        top = sorted(self.users.items(), key=lambda item: item[1]["balance"], reverse=True)[:limit]
+        return [(uid, u["balance"], u["status_level"]) for uid, u in top]
+
+    async def all_user_ids(self):
+        return list(self.users)
+
+    # --- CONFIG ---
+    async def get_config(self, key, default_value):
+        return self.config.setdefault(key, str(default_value))
+
+    async def set_config(self, key, value):
+        self.config[key] = str(value)
+        self.config_version += 1
+
+    async def get_config_version(self):
+        return self.config_version
+
+    # --- PROJECTS ---
+    async def list_projects(self):
+        return [(pid, p["name"]) for pid, p in self.projects.items()]
+
+    async def get_project(self, project_id):
+        p = self.projects.get(project_id)
+        return dict(p) if p else None
+
+    async def add_project(self, name, price, description, media_id, media_type, file_id):
+        pid = self.next_project_id
+        self.next_project_id += 1
+        self.projects[pid] = dict(zip(PROJECT_FIELDS, (pid, name, price, description, media_id, media_type, file_id)))
+
+    # --- PUL OPERATSIYALARI ---
+    async def add_balance(self, user_id, amount):
+        if user_id in self.users:
+            self.users[user_id]["balance"] += amount
+
+    async def add_balances(self, credits):
+        for uid, amount in credits:
+            await self.add_balance(uid, amount)
+
+    async def charge(self, user_id, amount):
+        await self.add_balance(user_id, -amount)
+
+    async def buy_status(self, user_id, cost, level, expire):
+        if user_id in self.users:
+            u = self.users[user_id]
+            u.update(balance=u["balance"] - cost, status_level=level, status_expire=expire)
+
+    async def transfer(self, from_id, to_id, amount):
+        await self.add_balance(from_id, -amount)
+        await self.add_balance(to_id, amount)
+
+
+# --------------------------------------------------------------------------------
+# --- POSTGRESQL (asyncpg) ---
+# --------------------------------------------------------------------------------
+SCHEMA_LOCK_ID = 727001 # pg_advisory_xact_lock kaliti (sxema yaratish uchun)
+
+class PostgresStorage(Storage):
+    """asyncpg pool orqali ishlaydi. asyncpg har bir ulanishda so'rovlarni prepared statement
+    sifatida keshlaydi, shuning uchun bir xil SQL qayta parse qilinmaydi."""
+
+    single_host = False # bir nechta node bitta bazaga ulanishi mumkin
+
+    def __init__(self, dsn, min_size=2, max_size=10):
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self.pool = None
+
+    async def connect(self):
+        try:
+            import asyncpg
+        except ImportError:
+            raise RuntimeError("PostgreSQL uchun asyncpg o'rnatilmagan: pip install asyncpg")
+        self.pool = await asyncpg.create_pool(self.dsn, min_size=self.min_size, max_size=self.max_size)
+        # Bir vaqtda ishga tushgan workerlar CREATE TABLE IF NOT EXISTS da to'qnashmasligi uchun
+        async with self.pool.acquire() as conn, conn.transaction():
+            await conn.execute("SELECT pg_advisory_xact_lock($1)", SCHEMA_LOCK_ID)
+            await conn.execute('''CREATE TABLE IF NOT EXISTS users
+                                  (id BIGINT PRIMARY KEY,
+                                   balance DOUBLE PRECISION DEFAULT 0.0,
+                                   status_level INTEGER DEFAULT 0,
+                                   status_expire TEXT,
+                                   referrer_id BIGINT,
+                                   joined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
+            await conn.execute('''CREATE TABLE IF NOT EXISTS config
+                                  (key TEXT PRIMARY KEY, value TEXT)''')
+            await conn.execute('''CREATE TABLE IF NOT EXISTS projects
+                                  (id SERIAL PRIMARY KEY,
+                                   name TEXT,
+                                   price DOUBLE PRECISION,
+                                   description TEXT,
+                                   media_id TEXT,
+                                   media_type TEXT,
+                                   file_id TEXT)''')
+
+    async def close(self):
+        if self.pool: await self.pool.close()
+
+    # --- USERS ---
+    async def user_exists(self, user_id):
+        return await self.pool.fetchval("SELECT 1 FROM users WHERE id = $1", user_id) is not None
+
+    async def add_user(self, user_id, referrer_id=None):
+        await self.pool.execute("INSERT INTO users (id, balance, referrer_id) VALUES ($1, 0.0, $2) ON CONFLICT (id) DO NOTHING",
+                                user_id, referrer_id)
+
+    async def get_user(self, user_id):
+        row = await self.pool.fetchrow("SELECT balance, status_level, status_expire FROM users WHERE id = $1", user_id)
+        return tuple(row) if row else None
+
+    async def reset_status(self, user_id):
+        await self.pool.execute("UPDATE users SET status_level = 0, status_expire = NULL WHERE id = $1", user_id)
+
+    async def top_users(self, limit=10):
+        rows = await self.pool.fetch("SELECT id, balance, status_level FROM users ORDER BY balance DESC LIMIT $1", limit)
+        return [tuple(r) for r in rows]
+
+    async def all_user_ids(self):
+        return [r[0] for r in await self.pool.fetch("SELECT id FROM users")]
+
+    # --- CONFIG ---
+    async def get_config(self, key, default_value):
+        res = await self.pool.fetchval("SELECT value FROM config WHERE key = $1", key)
+        if res is not None: return res
+        await self.pool.execute("INSERT INTO config (key, value) VALUES ($1, $2) ON CONFLICT (key) DO NOTHING", key, str(default_value))
+        return str(default_value)
+
+    async def set_config(self, key, value):
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                await conn.execute("INSERT INTO config (key, value) VALUES ($1, $2) ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value",
+                                   key, str(value))
+                await conn.execute("INSERT INTO config (key, value) VALUES ($1, '1') "
+                                   "ON CONFLICT (key) DO UPDATE SET value = (config.value::bigint + 1)::text", CONFIG_VERSION_KEY)
+
+    async def get_config_version(self):
+        res = await self.pool.fetchval("SELECT value FROM config WHERE key = $1", CONFIG_VERSION_KEY)
+        return int(res) if res is not None else 0
+
+    # --- PROJECTS ---
+    async def list_projects(self):
+        return [tuple(r) for r in await self.pool.fetch("SELECT id, name FROM projects ORDER BY id")]
+
+    async def get_project(self, project_id):
+        row = await self.pool.fetchrow(f"SELECT {', '.join(PROJECT_FIELDS)} FROM projects WHERE id = $1", project_id)
+        return dict(row) if row else None
+
+    async def add_project(self, name, price, description, media_id, media_type, file_id):
+        await self.pool.execute("INSERT INTO projects (name, price, description, media_id, media_type, file_id) VALUES ($1,$2,$3,$4,$5,$6)",
+                                name, price, description, media_id, media_type, file_id)
+
+    # --- PUL OPERATSIYALARI ---
+    async def add_balance(self, user_id, amount):
+        await self.pool.execute("UPDATE users SET balance = balance + $1 WHERE id = $2", amount, user_id)
+
+    async def add_balances(self, credits):
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                await conn.executemany("UPDATE users SET balance = balance + $1 WHERE id = $2",
+                                       [(amount, uid) for uid, amount in credits])
+
+    async def charge(self, user_id, amount):
+        await self.pool.execute("UPDATE users SET balance = balance - $1 WHERE id = $2", amount, user_id)
+
+    async def buy_status(self, user_id, cost, level, expire):
+        await self.pool.execute("UPDATE users SET balance = balance - $1, status_level = $2, status_expire = $3 WHERE id = $4",
+                                cost, level, expire, user_id)
+
+    async def transfer(self, from_id, to_id, amount):
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                await conn.execute("UPDATE users SET balance = balance - $1 WHERE id = $2", amount, from_id)
+                await conn.execute("UPDATE users SET balance = balance + $1 WHERE id = $2", amount, to_id)
+
+
+def create_storage(kind=None, db_name=None):
+    kind = (kind or os.getenv("STORAGE", "sqlite")).lower()
+    if kind == "memory":
+        return MemoryStorage()
+    if kind == "postgres":
+        return PostgresStorage(os.getenv("DATABASE_URL", "postgresql://localhost/bot"),
+                               max_size=int(os.getenv("DB_POOL_SIZE", "10")))
+    return SQLiteStorage(db_name or os.getenv("DB_NAME", "bot_database_coin_pro.db"))